@@ -2,182 +2,149 @@
 Create evaluation dataset for PatchGuard
 Generates 500 vulnerable code samples across common CWE categories
 
+The output is deterministic, so this only needs to be re-run when the
+templates change. The evaluation scripts read the generated
+evaluation_dataset_500.json that is checked in next to this file.
+
 TODO: Could add more CWE types later if we have time
 """
 
 import json
+import sys
 from pathlib import Path
 
-def generate_evaluation_dataset():
-    """Generate 500 diverse vulnerability samples"""
+# orjson is a lot faster than the stdlib encoder, but keep json as a fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-    # using a simple counter for IDs
-    samples = []
-    sample_id = 0
+# isal's igzip is a drop-in gzip replacement with much faster compression
+try:
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+# Large write buffer for the stdlib json fallback (it emits many tiny chunks)
+WRITE_BUFFER_SIZE = 1 << 20
 
-    # 1. SQL Injection (CWE-89) - 100 samples
-    print("Generating SQL Injection samples...")
-    sql_templates = [
-        {
-            "vulnerable": '''def get_user(username):
+# SQL Injection (CWE-89)
+SQL_TEMPLATES = [
+    {
+        "vulnerable": '''def get_user(username):
     query = "SELECT * FROM users WHERE username = '" + username + "'"
     return db.execute(query)''',
-            "fixed": '''def get_user(username):
+        "fixed": '''def get_user(username):
     query = "SELECT * FROM users WHERE username = ?"
     return db.execute(query, (username,))''',
-            "desc": "SQL injection via string concatenation in user query"
-        },
-        {
-            "vulnerable": '''def login(email, password):
+        "desc": "SQL injection via string concatenation in user query"
+    },
+    {
+        "vulnerable": '''def login(email, password):
     sql = f"SELECT * FROM users WHERE email='{email}' AND password='{password}'"
     return database.query(sql)''',
-            "fixed": '''def login(email, password):
+        "fixed": '''def login(email, password):
     sql = "SELECT * FROM users WHERE email=? AND password=?"
     return database.query(sql, (email, password))''',
-            "desc": "SQL injection in authentication query"
-        },
-        {
-            "vulnerable": '''def search_products(keyword):
+        "desc": "SQL injection in authentication query"
+    },
+    {
+        "vulnerable": '''def search_products(keyword):
     return db.execute("SELECT * FROM products WHERE name LIKE '%" + keyword + "%'")''',
-            "fixed": '''def search_products(keyword):
+        "fixed": '''def search_products(keyword):
     return db.execute("SELECT * FROM products WHERE name LIKE ?", ('%' + keyword + '%',))''',
-            "desc": "SQL injection in search functionality"
-        },
-        {
-            "vulnerable": '''def delete_user(user_id):
+        "desc": "SQL injection in search functionality"
+    },
+    {
+        "vulnerable": '''def delete_user(user_id):
     query = "DELETE FROM users WHERE id = " + str(user_id)
     db.execute(query)''',
-            "fixed": '''def delete_user(user_id):
+        "fixed": '''def delete_user(user_id):
     query = "DELETE FROM users WHERE id = ?"
     db.execute(query, (user_id,))''',
-            "desc": "SQL injection in delete operation"
-        },
-    ]
+        "desc": "SQL injection in delete operation"
+    },
+]
 
-    for i in range(100):
-        template = sql_templates[i % len(sql_templates)]
-        samples.append({
-            "id": f"sql_{sample_id}",
-            "language": "python",
-            "vulnerability_type": "CWE-89",
-            "cwe_name": "SQL Injection",
-            "vulnerable_code": template["vulnerable"],
-            "fixed_code": template["fixed"],
-            "description": template["desc"],
-            "severity": "HIGH"
-        })
-        sample_id += 1
-
-    # 2. XSS (CWE-79) - 100 samples
-    print("Generating XSS samples...")
-    xss_templates = [
-        {
-            "vulnerable": '''def render_comment(comment):
+# XSS (CWE-79)
+XSS_TEMPLATES = [
+    {
+        "vulnerable": '''def render_comment(comment):
     return f"<div class='comment'>{comment}</div>"''',
-            "fixed": '''import html
+        "fixed": '''import html
 def render_comment(comment):
     return f"<div class='comment'>{html.escape(comment)}</div>"''',
-            "desc": "XSS through unescaped HTML in comment"
-        },
-        {
-            "vulnerable": '''def show_user_profile(username):
+        "desc": "XSS through unescaped HTML in comment"
+    },
+    {
+        "vulnerable": '''def show_user_profile(username):
     return "<h1>Welcome " + username + "</h1>"''',
-            "fixed": '''import html
+        "fixed": '''import html
 def show_user_profile(username):
     return "<h1>Welcome " + html.escape(username) + "</h1>"''',
-            "desc": "XSS in user profile display"
-        },
-        {
-            "vulnerable": '''def search_results(query):
+        "desc": "XSS in user profile display"
+    },
+    {
+        "vulnerable": '''def search_results(query):
     return f"<p>Results for: {query}</p>"''',
-            "fixed": '''import html
+        "fixed": '''import html
 def search_results(query):
     return f"<p>Results for: {html.escape(query)}</p>"''',
-            "desc": "XSS in search results"
-        },
-        {
-            "vulnerable": '''def error_page(error_msg):
+        "desc": "XSS in search results"
+    },
+    {
+        "vulnerable": '''def error_page(error_msg):
     return f"<div class='error'>{error_msg}</div>"''',
-            "fixed": '''import html
+        "fixed": '''import html
 def error_page(error_msg):
     return f"<div class='error'>{html.escape(error_msg)}</div>"''',
-            "desc": "XSS in error message display"
-        },
-    ]
+        "desc": "XSS in error message display"
+    },
+]
 
-    for i in range(100):
-        template = xss_templates[i % len(xss_templates)]
-        samples.append({
-            "id": f"xss_{sample_id}",
-            "language": "python",
-            "vulnerability_type": "CWE-79",
-            "cwe_name": "Cross-Site Scripting",
-            "vulnerable_code": template["vulnerable"],
-            "fixed_code": template["fixed"],
-            "description": template["desc"],
-            "severity": "MEDIUM"
-        })
-        sample_id += 1
-
-    # 3. Command Injection (CWE-78) - 100 samples
-    print("Generating Command Injection samples...")
-    cmd_templates = [
-        {
-            "vulnerable": '''def backup_file(filename):
+# Command Injection (CWE-78)
+CMD_TEMPLATES = [
+    {
+        "vulnerable": '''def backup_file(filename):
     os.system(f"tar -czf backup.tar.gz {filename}")''',
-            "fixed": '''import subprocess
+        "fixed": '''import subprocess
 def backup_file(filename):
     subprocess.run(["tar", "-czf", "backup.tar.gz", filename], check=True)''',
-            "desc": "Command injection through os.system"
-        },
-        {
-            "vulnerable": '''def ping_host(hostname):
+        "desc": "Command injection through os.system"
+    },
+    {
+        "vulnerable": '''def ping_host(hostname):
     return os.popen("ping -c 1 " + hostname).read()''',
-            "fixed": '''import subprocess
+        "fixed": '''import subprocess
 def ping_host(hostname):
     return subprocess.run(["ping", "-c", "1", hostname], capture_output=True, text=True).stdout''',
-            "desc": "Command injection in network utility"
-        },
-        {
-            "vulnerable": '''def convert_image(input_file, output_file):
+        "desc": "Command injection in network utility"
+    },
+    {
+        "vulnerable": '''def convert_image(input_file, output_file):
     os.system(f"convert {input_file} {output_file}")''',
-            "fixed": '''import subprocess
+        "fixed": '''import subprocess
 def convert_image(input_file, output_file):
     subprocess.run(["convert", input_file, output_file], check=True)''',
-            "desc": "Command injection in image processing"
-        },
-        {
-            "vulnerable": '''def compress_directory(dir_path):
+        "desc": "Command injection in image processing"
+    },
+    {
+        "vulnerable": '''def compress_directory(dir_path):
     os.system("zip -r archive.zip " + dir_path)''',
-            "fixed": '''import subprocess
+        "fixed": '''import subprocess
 def compress_directory(dir_path):
     subprocess.run(["zip", "-r", "archive.zip", dir_path], check=True)''',
-            "desc": "Command injection in file compression"
-        },
-    ]
-
-    for i in range(100):
-        template = cmd_templates[i % len(cmd_templates)]
-        samples.append({
-            "id": f"cmd_{sample_id}",
-            "language": "python",
-            "vulnerability_type": "CWE-78",
-            "cwe_name": "OS Command Injection",
-            "vulnerable_code": template["vulnerable"],
-            "fixed_code": template["fixed"],
-            "description": template["desc"],
-            "severity": "HIGH"
-        })
-        sample_id += 1
+        "desc": "Command injection in file compression"
+    },
+]
 
-    # 4. Path Traversal (CWE-22) - 100 samples
-    print("Generating Path Traversal samples...")
-    path_templates = [
-        {
-            "vulnerable": '''def read_file(filename):
+# Path Traversal (CWE-22)
+PATH_TEMPLATES = [
+    {
+        "vulnerable": '''def read_file(filename):
     with open(f"./uploads/{filename}", 'r') as f:
         return f.read()''',
-            "fixed": '''import os
+        "fixed": '''import os
 def read_file(filename):
     base_path = os.path.abspath("./uploads/")
     file_path = os.path.normpath(os.path.join(base_path, filename))
@@ -185,37 +152,37 @@ def read_file(filename):
         raise ValueError("Invalid path")
     with open(file_path, 'r') as f:
         return f.read()''',
-            "desc": "Path traversal in file reading"
-        },
-        {
-            "vulnerable": '''def serve_file(filepath):
+        "desc": "Path traversal in file reading"
+    },
+    {
+        "vulnerable": '''def serve_file(filepath):
     return open("static/" + filepath, 'rb').read()''',
-            "fixed": '''import os
+        "fixed": '''import os
 def serve_file(filepath):
     base = os.path.abspath("static/")
     full_path = os.path.normpath(os.path.join(base, filepath))
     if not full_path.startswith(base):
         raise ValueError("Access denied")
     return open(full_path, 'rb').read()''',
-            "desc": "Path traversal in static file serving"
-        },
-        {
-            "vulnerable": '''def delete_upload(filename):
+        "desc": "Path traversal in static file serving"
+    },
+    {
+        "vulnerable": '''def delete_upload(filename):
     os.remove(f"./uploads/{filename}")''',
-            "fixed": '''import os
+        "fixed": '''import os
 def delete_upload(filename):
     base = os.path.abspath("./uploads/")
     path = os.path.normpath(os.path.join(base, filename))
     if not path.startswith(base):
         raise ValueError("Invalid path")
     os.remove(path)''',
-            "desc": "Path traversal in file deletion"
-        },
-        {
-            "vulnerable": '''def get_template(name):
+        "desc": "Path traversal in file deletion"
+    },
+    {
+        "vulnerable": '''def get_template(name):
     with open("templates/" + name + ".html") as f:
         return f.read()''',
-            "fixed": '''import os
+        "fixed": '''import os
 def get_template(name):
     base = os.path.abspath("templates/")
     path = os.path.normpath(os.path.join(base, name + ".html"))
@@ -223,101 +190,154 @@ def get_template(name):
         raise ValueError("Invalid template")
     with open(path) as f:
         return f.read()''',
-            "desc": "Path traversal in template loading"
-        },
-    ]
-
-    for i in range(100):
-        template = path_templates[i % len(path_templates)]
-        samples.append({
-            "id": f"path_{sample_id}",
-            "language": "python",
-            "vulnerability_type": "CWE-22",
-            "cwe_name": "Path Traversal",
-            "vulnerable_code": template["vulnerable"],
-            "fixed_code": template["fixed"],
-            "description": template["desc"],
-            "severity": "MEDIUM"
-        })
-        sample_id += 1
+        "desc": "Path traversal in template loading"
+    },
+]
 
-    # 5. Hardcoded Credentials (CWE-798) - 100 samples
-    print("Generating Hardcoded Credentials samples...")
-    cred_templates = [
-        {
-            "vulnerable": '''def connect_database():
+# Hardcoded Credentials (CWE-798)
+CRED_TEMPLATES = [
+    {
+        "vulnerable": '''def connect_database():
     password = "admin123"
     return db.connect("localhost", "admin", password)''',
-            "fixed": '''import os
+        "fixed": '''import os
 def connect_database():
     password = os.environ.get("DB_PASSWORD")
     return db.connect("localhost", "admin", password)''',
-            "desc": "Hardcoded database password"
-        },
-        {
-            "vulnerable": '''def api_request():
+        "desc": "Hardcoded database password"
+    },
+    {
+        "vulnerable": '''def api_request():
     api_key = "sk_live_123456789"
     headers = {"Authorization": f"Bearer {api_key}"}
     return requests.get(url, headers=headers)''',
-            "fixed": '''import os
+        "fixed": '''import os
 def api_request():
     api_key = os.environ.get("API_KEY")
     headers = {"Authorization": f"Bearer {api_key}"}
     return requests.get(url, headers=headers)''',
-            "desc": "Hardcoded API key"
-        },
-        {
-            "vulnerable": '''def smtp_connect():
+        "desc": "Hardcoded API key"
+    },
+    {
+        "vulnerable": '''def smtp_connect():
     password = "emailpass123"
     return smtplib.SMTP("smtp.gmail.com", 587, password)''',
-            "fixed": '''import os
+        "fixed": '''import os
 def smtp_connect():
     password = os.environ.get("SMTP_PASSWORD")
     return smtplib.SMTP("smtp.gmail.com", 587, password)''',
-            "desc": "Hardcoded email password"
-        },
-        {
-            "vulnerable": '''def aws_upload():
+        "desc": "Hardcoded email password"
+    },
+    {
+        "vulnerable": '''def aws_upload():
     secret = "AWS_SECRET_123ABC"
     client = boto3.client('s3', aws_secret_access_key=secret)
     return client''',
-            "fixed": '''import os
+        "fixed": '''import os
 def aws_upload():
     secret = os.environ.get("AWS_SECRET_ACCESS_KEY")
     client = boto3.client('s3', aws_secret_access_key=secret)
     return client''',
-            "desc": "Hardcoded AWS credentials"
-        },
-    ]
+        "desc": "Hardcoded AWS credentials"
+    },
+]
 
-    for i in range(100):
-        template = cred_templates[i % len(cred_templates)]
-        samples.append({
-            "id": f"cred_{sample_id}",
+# (id prefix, CWE, CWE name, severity, templates) - 100 samples each
+CWE_SPECS = [
+    ("sql", "CWE-89", "SQL Injection", "HIGH", SQL_TEMPLATES),
+    ("xss", "CWE-79", "Cross-Site Scripting", "MEDIUM", XSS_TEMPLATES),
+    ("cmd", "CWE-78", "OS Command Injection", "HIGH", CMD_TEMPLATES),
+    ("path", "CWE-22", "Path Traversal", "MEDIUM", PATH_TEMPLATES),
+    ("cred", "CWE-798", "Hardcoded Credentials", "HIGH", CRED_TEMPLATES),
+]
+
+# Flat table of the 20 distinct sample payloads (everything except the id).
+# The template strings are reused 500 times, so intern them once here.
+TEMPLATES = []
+
+# (id prefix, CWE name, index of first template in TEMPLATES, template count)
+CATEGORIES = []
+
+for _prefix, _cwe, _name, _severity, _templates in CWE_SPECS:
+    CATEGORIES.append((_prefix, _name, len(TEMPLATES), len(_templates)))
+    for _t in _templates:
+        TEMPLATES.append({
             "language": "python",
-            "vulnerability_type": "CWE-798",
-            "cwe_name": "Hardcoded Credentials",
-            "vulnerable_code": template["vulnerable"],
-            "fixed_code": template["fixed"],
-            "description": template["desc"],
-            "severity": "HIGH"
+            "vulnerability_type": _cwe,
+            "cwe_name": _name,
+            "vulnerable_code": sys.intern(_t["vulnerable"]),
+            "fixed_code": sys.intern(_t["fixed"]),
+            "description": sys.intern(_t["desc"]),
+            "severity": _severity
         })
-        sample_id += 1
 
-    return samples
+def generate_sample_rows():
+    """
+    Generate the 500 samples as compact (id, template index) rows.
+    Use to_record() to expand a row into the full sample dict.
+    """
+
+    # using a simple counter for IDs (also the index into the preallocated list)
+    rows = [None] * (100 * len(CATEGORIES))
+    sample_id = 0
+
+    for prefix, name, first, count in CATEGORIES:
+        print(f"Generating {name} samples...")
+
+        for i in range(100):
+            rows[sample_id] = (f"{prefix}_{sample_id}", first + i % count)
+            sample_id += 1
+
+    return rows
+
+def to_record(row):
+    """Expand an (id, template index) row into a full sample dict"""
+    sample_id, template_idx = row
+    return {"id": sample_id, **TEMPLATES[template_idx]}
+
+def generate_evaluation_dataset():
+    """Generate 500 diverse vulnerability samples"""
+    return [to_record(row) for row in generate_sample_rows()]
+
+def save_dataset(records, output_path):
+    """
+    Write the records as indented JSON. If output_path ends in .gz the JSON
+    is compressed on the fly, so the uncompressed file never hits disk.
+    """
+    output_path = Path(output_path)
+    compress = output_path.suffix == ".gz"
+
+    if orjson is not None:
+        data = orjson.dumps(records, option=orjson.OPT_INDENT_2)
+        if compress:
+            with gzip.open(output_path, 'wb', compresslevel=6) as f:
+                f.write(data)
+        else:
+            output_path.write_bytes(data)
+    elif compress:
+        with gzip.open(output_path, 'wt', compresslevel=6, encoding='utf-8') as f:
+            json.dump(records, f, indent=2)
+    else:
+        with open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            json.dump(records, f, indent=2)
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create the PatchGuard evaluation dataset")
+    parser.add_argument("--gzip", action="store_true", help="Write evaluation_dataset_500.json.gz instead")
+    args = parser.parse_args()
+
     print("="*70)
     print("Creating PatchGuard Evaluation Dataset")
     print("="*70)
 
-    # Generate the dataset
-    dataset = generate_evaluation_dataset()
+    # Generate the dataset (rows are only expanded to full dicts for saving)
+    dataset = generate_sample_rows()
 
     # Save to JSON file
-    output_json = Path("evaluation_dataset_500.json")
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(dataset, f, indent=2)
+    output_json = Path("evaluation_dataset_500.json.gz" if args.gzip else "evaluation_dataset_500.json")
+    save_dataset([to_record(row) for row in dataset], output_json)
 
     print(f"\nDataset created: {output_json}")
     print(f"Total samples: {len(dataset)}")
@@ -3,12 +3,146 @@ Download and prepare Kaggle vulnerability dataset
 This script downloads CVEfixes dataset and prepares 500 samples for evaluation.
 """
 
-import os
-import subprocess
+import sys
+import importlib.util
+import csv
+import shutil
 import json
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import pandas as pd
 from pathlib import Path
 
+# orjson is a lot faster than the stdlib encoder, but keep json as a fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Large write buffer for the stdlib json fallback (it emits many tiny chunks)
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Language / file_extension values that count as Python (py, .py, Python 3, ...).
+# Compiled once and shared by every CSV we scan.
+PYTHON_LANG_RE = re.compile(r"\b(py|python[23]?)\b", re.IGNORECASE)
+
+@lru_cache(maxsize=None)
+def is_python_lang(value):
+    """True if a language column value means Python (cached, values repeat a lot)"""
+    return isinstance(value, str) and PYTHON_LANG_RE.search(value) is not None
+
+# Columns we actually use from CVEfixes; everything else is skipped on load
+NEEDED_COLUMNS = {"language", "file_extension", "func_before", "func_after", "cve_id", "cwe_id"}
+
+# We only keep 500 rows, so there is no point parsing the whole multi-GB CSV
+MAX_CSV_ROWS = 50000
+
+# Copy buffer for zip extraction (default is only 16 KiB per read)
+EXTRACT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Number of zip members extracted at the same time. Decompression and file
+# writes both release the GIL, so a few threads keep several writes in flight.
+EXTRACT_WORKERS = 4
+
+def copy_zip_member(zf, info, target):
+    """Stream one zip member to target with a large copy buffer"""
+    with zf.open(info) as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst, length=EXTRACT_BUFFER_SIZE)
+
+def extract_zip(zip_path, dest_dir, max_workers=EXTRACT_WORKERS):
+    """
+    Extract every member of zip_path into dest_dir, streaming each one
+    with a large copy buffer. Members that would escape dest_dir are skipped.
+    """
+    dest_dir = Path(dest_dir).resolve()
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        files = []
+        for info in zf.infolist():
+            target = (dest_dir / info.filename).resolve()
+            if dest_dir not in target.parents:
+                print(f"Skipping unsafe zip member: {info.filename}")
+                continue
+
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+                continue
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            files.append((info, target))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(copy_zip_member, zf, info, target) for info, target in files]
+            for future in futures:
+                future.result()  # re-raise any extraction error
+
+# (id prefix, vulnerability type, vulnerable code, fixed code, description)
+# for the fallback manual dataset - 10 samples each
+MANUAL_CATEGORIES = [
+    (
+        "sql",
+        "CWE-89: SQL Injection",
+        """def get_user(username):
+    query = "SELECT * FROM users WHERE username = '" + username + "'"
+    return db.execute(query)""",
+        """def get_user(username):
+    query = "SELECT * FROM users WHERE username = ?"
+    return db.execute(query, (username,))""",
+        "SQL injection through string concatenation"
+    ),
+    (
+        "xss",
+        "CWE-79: XSS",
+        """def render_comment(comment):
+    return f"<div>{comment}</div>" """,
+        """import html
+def render_comment(comment):
+    return f"<div>{html.escape(comment)}</div>" """,
+        "XSS through unescaped user input"
+    ),
+    (
+        "cmd",
+        "CWE-78: Command Injection",
+        """def backup_file(filename):
+    os.system(f"tar -czf backup.tar.gz {filename}")""",
+        """import subprocess
+def backup_file(filename):
+    subprocess.run(["tar", "-czf", "backup.tar.gz", filename], check=True)""",
+        "Command injection through os.system"
+    ),
+    (
+        "path",
+        "CWE-22: Path Traversal",
+        """def read_file(filename):
+    with open(f"./uploads/{filename}", 'r') as f:
+        return f.read()""",
+        """import os
+def read_file(filename):
+    safe_path = os.path.normpath(os.path.join("./uploads/", filename))
+    if not safe_path.startswith(os.path.abspath("./uploads/")):
+        raise ValueError("Invalid path")
+    with open(safe_path, 'r') as f:
+        return f.read()""",
+        "Path traversal vulnerability"
+    ),
+    (
+        "creds",
+        "CWE-798: Hardcoded Credentials",
+        """def connect_db():
+    password = "admin123"
+    return db.connect("localhost", "admin", password)""",
+        """import os
+def connect_db():
+    password = os.environ.get("DB_PASSWORD")
+    return db.connect("localhost", "admin", password)""",
+        "Hardcoded database credentials"
+    ),
+]
+
+# Each of these strings ends up in 10 samples, so intern them once at import
+MANUAL_CATEGORIES = [tuple(sys.intern(field) for field in spec) for spec in MANUAL_CATEGORIES]
+
 def download_cvefixes_dataset():
     """
     Download CVEfixes dataset from Kaggle.
@@ -16,44 +150,101 @@ def download_cvefixes_dataset():
     """
     print("Downloading CVEfixes dataset from Kaggle...")
 
-    # Check if kaggle is installed
-    try:
-        subprocess.run(["kaggle", "--version"], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("ERROR: Kaggle CLI not found.")
+    # Check if kaggle is installed (in-memory lookup, nothing is imported or run)
+    if importlib.util.find_spec("kaggle") is None:
+        print("ERROR: Kaggle package not found.")
         print("Install it with: pip install kaggle")
         print("Then configure credentials: https://www.kaggle.com/docs/api")
         return False
 
     # Download dataset
     try:
+        from kaggle.api.kaggle_api_extended import KaggleApi
+
+        api = KaggleApi()
+        api.authenticate()
+
         dataset_name = "girish17019/cvefixes-vulnerable-and-fixed-code"
-        subprocess.run(
-            ["kaggle", "datasets", "download", "-d", dataset_name, "-p", "data/"],
-            check=True
-        )
+        api.dataset_download_files(dataset_name, path="data/", unzip=True, quiet=False)
         print("Dataset downloaded successfully!")
 
-        # Unzip if needed
-        import zipfile
+        # Older kaggle versions may leave the zip behind, extract it ourselves
         zip_path = Path("data/cvefixes-vulnerable-and-fixed-code.zip")
         if zip_path.exists():
             print("Extracting dataset...")
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall("data/")
+            extract_zip(zip_path, "data/")
             zip_path.unlink()  # Remove zip file
             print("Extraction complete!")
 
         return True
 
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         print(f"Error downloading dataset: {e}")
         return False
 
-def prepare_500_samples():
+def read_dataset_csv(csv_file, nrows=MAX_CSV_ROWS):
+    """
+    Load only the columns we need (and at most nrows rows) from a dataset CSV.
+    Falls back to all columns if none of the expected ones are present.
+    """
+    header = pd.read_csv(csv_file, nrows=0).columns
+    needed = [c for c in header if c in NEEDED_COLUMNS] or None
+    return pd.read_csv(csv_file, usecols=needed, dtype='string', nrows=nrows, engine='c')
+
+def stream_python_samples(csv_file, limit=500):
+    """
+    Read a dataset CSV row by row and keep Python samples only,
+    stopping as soon as `limit` matches have been found.
+    Returns (records, all column names in the file).
+    """
+    # code columns can be much larger than the csv module's default field limit
+    csv.field_size_limit(2**31 - 1)
+
+    records = []
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        keep = [c for c in columns if c in NEEDED_COLUMNS] or columns
+
+        lang_col = None
+        if 'language' in columns or 'file_extension' in columns:
+            lang_col = 'language' if 'language' in columns else 'file_extension'
+
+        for row in reader:
+            if lang_col and not is_python_lang(row[lang_col]):
+                continue
+            records.append({c: row[c] for c in keep})
+            if len(records) >= limit:
+                break
+
+    return records, columns
+
+def save_sample_records(records, data_dir):
+    """Save sample records as a JSON array and as CSV"""
+    # Same file name and layout (list of records) as before, just without
+    # the indentation, which roughly doubled the file size
+    output_file = data_dir / "evaluation_samples_500.json"
+    if orjson is not None:
+        output_file.write_bytes(orjson.dumps(records))
+    else:
+        with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            json.dump(records, f, ensure_ascii=False)
+    print(f"\nSaved {len(records)} samples to: {output_file}")
+
+    csv_output = data_dir / "evaluation_samples_500.csv"
+    with open(csv_output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0].keys()) if records else [])
+        writer.writeheader()
+        writer.writerows(records)
+    print(f"Saved {len(records)} samples to: {csv_output}")
+
+def prepare_500_samples(use_pandas=False):
     """
     Extract 500 samples from the dataset for evaluation.
     Focuses on Python vulnerabilities for consistency.
+
+    By default the CSV is streamed and reading stops after 500 Python rows.
+    Pass use_pandas=True to load it into a DataFrame instead (handy for exploring).
     """
     print("\nPreparing 500 samples for evaluation...")
 
@@ -70,14 +261,28 @@ def prepare_500_samples():
     # Try to load the main dataset
     for csv_file in csv_files:
         try:
-            df = pd.read_csv(csv_file)
+            if not use_pandas:
+                records, columns = stream_python_samples(csv_file)
+                print(f"\nScanned {csv_file.name}")
+                print(f"Columns: {columns}")
+                print(f"Python samples: {len(records)}")
+                save_sample_records(records, data_dir)
+                return
+
+            df = read_dataset_csv(csv_file)
             print(f"\nLoaded {csv_file.name}: {len(df)} rows")
             print(f"Columns: {list(df.columns)}")
 
             # Filter for Python files if language column exists
             if 'language' in df.columns or 'file_extension' in df.columns:
                 lang_col = 'language' if 'language' in df.columns else 'file_extension'
-                df_python = df[df[lang_col].str.lower().str.contains('py|python', na=False)]
+                # Only the (few) distinct categories get lowercased, not every row
+                cats = df[lang_col].astype('category')
+                py_codes = [
+                    i for i, c in enumerate(cats.cat.categories)
+                    if is_python_lang(c)
+                ]
+                df_python = df[cats.cat.codes.isin(py_codes)]
                 print(f"Python samples: {len(df_python)}")
             else:
                 df_python = df
@@ -85,15 +290,10 @@ def prepare_500_samples():
             # Take 500 samples
             samples = df_python.head(500)
 
-            # Save to JSON for easy loading
-            output_file = data_dir / "evaluation_samples_500.json"
-            samples.to_json(output_file, orient='records', indent=2)
-            print(f"\nSaved 500 samples to: {output_file}")
-
-            # Also save as CSV
-            csv_output = data_dir / "evaluation_samples_500.csv"
-            samples.to_csv(csv_output, index=False)
-            print(f"Saved 500 samples to: {csv_output}")
+            # Walk the frame once; the JSON array and CSV are both written from
+            # these records (missing values become None instead of pd.NA)
+            records = samples.astype(object).where(samples.notna(), None).to_dict(orient='records')
+            save_sample_records(records, data_dir)
 
             return
 
@@ -103,97 +303,42 @@ def prepare_500_samples():
 
     print("Could not prepare samples from any CSV file.")
 
-def create_manual_dataset():
+def build_manual_samples():
+    """Build the 50 manual samples in memory (nothing is written to disk)"""
+    return [
+        {
+            "id": f"{prefix}_{i}",
+            "language": "python",
+            "vulnerability_type": vuln_type,
+            "vulnerable_code": vulnerable,
+            "fixed_code": fixed,
+            "description": desc
+        }
+        for prefix, vuln_type, vulnerable, fixed, desc in MANUAL_CATEGORIES
+        for i in range(10)
+    ]
+
+def create_manual_dataset(samples=None):
     """
     Create a small manual dataset if Kaggle download fails.
     This creates sample vulnerable code snippets for testing.
+
+    Args:
+        samples: Already built samples (from build_manual_samples) to save.
+                 If None, they are built here.
     """
     print("\nCreating manual test dataset (50 samples)...")
 
-    samples = []
-
-    # SQL Injection examples
-    for i in range(10):
-        samples.append({
-            "id": f"sql_{i}",
-            "language": "python",
-            "vulnerability_type": "CWE-89: SQL Injection",
-            "vulnerable_code": f"""def get_user(username):
-    query = "SELECT * FROM users WHERE username = '" + username + "'"
-    return db.execute(query)""",
-            "fixed_code": f"""def get_user(username):
-    query = "SELECT * FROM users WHERE username = ?"
-    return db.execute(query, (username,))""",
-            "description": "SQL injection through string concatenation"
-        })
-
-    # XSS examples
-    for i in range(10):
-        samples.append({
-            "id": f"xss_{i}",
-            "language": "python",
-            "vulnerability_type": "CWE-79: XSS",
-            "vulnerable_code": f"""def render_comment(comment):
-    return f"<div>{{comment}}</div>" """,
-            "fixed_code": f"""import html
-def render_comment(comment):
-    return f"<div>{{html.escape(comment)}}</div>" """,
-            "description": "XSS through unescaped user input"
-        })
-
-    # Command Injection examples
-    for i in range(10):
-        samples.append({
-            "id": f"cmd_{i}",
-            "language": "python",
-            "vulnerability_type": "CWE-78: Command Injection",
-            "vulnerable_code": f"""def backup_file(filename):
-    os.system(f"tar -czf backup.tar.gz {{filename}}")""",
-            "fixed_code": f"""import subprocess
-def backup_file(filename):
-    subprocess.run(["tar", "-czf", "backup.tar.gz", filename], check=True)""",
-            "description": "Command injection through os.system"
-        })
-
-    # Path Traversal examples
-    for i in range(10):
-        samples.append({
-            "id": f"path_{i}",
-            "language": "python",
-            "vulnerability_type": "CWE-22: Path Traversal",
-            "vulnerable_code": f"""def read_file(filename):
-    with open(f"./uploads/{{filename}}", 'r') as f:
-        return f.read()""",
-            "fixed_code": f"""import os
-def read_file(filename):
-    safe_path = os.path.normpath(os.path.join("./uploads/", filename))
-    if not safe_path.startswith(os.path.abspath("./uploads/")):
-        raise ValueError("Invalid path")
-    with open(safe_path, 'r') as f:
-        return f.read()""",
-            "description": "Path traversal vulnerability"
-        })
-
-    # Hardcoded credentials examples
-    for i in range(10):
-        samples.append({
-            "id": f"creds_{i}",
-            "language": "python",
-            "vulnerability_type": "CWE-798: Hardcoded Credentials",
-            "vulnerable_code": f"""def connect_db():
-    password = "admin123"
-    return db.connect("localhost", "admin", password)""",
-            "fixed_code": f"""import os
-def connect_db():
-    password = os.environ.get("DB_PASSWORD")
-    return db.connect("localhost", "admin", password)""",
-            "description": "Hardcoded database credentials"
-        })
+    if samples is None:
+        samples = build_manual_samples()
 
     # Save manual dataset
     output_file = Path("data/manual_evaluation_samples.json")
-    with open(output_file, 'w') as f:
-        json.dump(samples, f, indent=2)
+    if orjson is not None:
+        output_file.write_bytes(orjson.dumps(samples, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            json.dump(samples, f, indent=2)
 
     print(f"Created manual dataset with {len(samples)} samples: {output_file}")
     return samples
@@ -203,8 +348,11 @@ if __name__ == "__main__":
     print("PatchGuard Dataset Preparation")
     print("=" * 60)
 
-    # Try to download from Kaggle
-    success = download_cvefixes_dataset()
+    # Try to download from Kaggle, building the manual fallback samples
+    # in the background meanwhile so they are ready if the download fails
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        manual_future = executor.submit(build_manual_samples)
+        success = download_cvefixes_dataset()
 
     if success:
         # Prepare 500 samples
@@ -217,7 +365,7 @@ if __name__ == "__main__":
         print("3. Place in: ~/.kaggle/kaggle.json")
 
         # Create manual dataset as fallback
-        create_manual_dataset()
+        create_manual_dataset(manual_future.result())
 
     print("\n" + "=" * 60)
     print("Dataset preparation complete!")
@@ -0,0 +1,22 @@
+"""
+Shared setup for the evaluation scripts.
+
+Puts the project root on sys.path (once) and imports the PatchGuard modules
+through the src package, so run_evaluation.py and run_full_evaluation.py
+share the same module objects instead of importing everything twice under
+different names.
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PROMPTS_DIR = PROJECT_ROOT / "experiments" / "prompts"
+DATA_DIR = PROJECT_ROOT / "data"
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.pipeline import PatchGuardPipeline
+from src.baseline_patcher import SimplePromptPatcher, AiderBaseline
+from src.vllm_patcher import VLLMPatcher
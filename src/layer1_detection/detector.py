@@ -1,4 +1,50 @@
 import re
+import threading
+
+# Optional: Hyperscan compiles all patterns into one SIMD DFA (pip install hyperscan)
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Optional: RE2 matches all patterns in one linear-time pass, for any input
+# (pip install google-re2)
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# re.IGNORECASE matches dotted and dotless I (U+0130, U+0131) with "i", RE2
+# doesn't; every other letter folds the same way in both
+_RE2_FOLD = str.maketrans({"\u0130": "i", "\u0131": "i"})
+
+def _is_literal(pattern: str) -> bool:
+    """True if the regex only matches its own text (escaped punctuation is fine)"""
+    if re.search(r"\\[A-Za-z0-9]", pattern):
+        return False
+    return not re.search(r"[.^$*+?{}\[\]|()]", re.sub(r"\\.", "", pattern))
+
+
+def _build_re2_set(patterns):
+    """
+    Case-insensitive RE2 set of all patterns, or None without re2. Only for
+    ASCII patterns, which is what _RE2_FOLD's equivalence with re relies on.
+    """
+    if re2 is None or not all(p.isascii() for p in patterns):
+        return None
+    options = re2.Options()
+    options.case_sensitive = False
+    pattern_set = re2.Set.SearchSet(options)
+    try:
+        for i, p in enumerate(patterns):
+            if pattern_set.Add(p) != i:
+                return None
+        pattern_set.Compile()
+    except Exception:
+        # a pattern RE2 can't handle (backreference, lookaround, ...)
+        return None
+    return pattern_set
+
 
 class PromptDetector:
     """
@@ -27,6 +73,35 @@ class PromptDetector:
         # Compile patterns for performance
         self.patterns = [re.compile(p, re.IGNORECASE) for p in self.forbidden_phrases]
 
+        # All phrases in one alternation so the text is scanned once. Each
+        # phrase is a named group p<i>; the lookahead makes the match
+        # zero-width so overlapping phrases are still all found.
+        self.combined = re.compile(
+            "(?=" + "|".join(f"(?P<p{i}>{p})" for i, p in enumerate(self.forbidden_phrases)) + ")",
+            re.IGNORECASE
+        )
+
+        # Plain-text form of each phrase ("os\.system" -> "os.system") for a
+        # cheap substring prefilter; None if any phrase is a real regex
+        if all(_is_literal(p) for p in self.forbidden_phrases):
+            self._literals = [re.sub(r"\\(.)", r"\1", p).lower() for p in self.forbidden_phrases]
+        else:
+            self._literals = None
+
+        # Same patterns as a Hyperscan database, if available
+        self._hs_db = None
+        if hyperscan is not None:
+            self._hs_db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+            self._hs_db.compile(
+                expressions=[p.encode() for p in self.forbidden_phrases],
+                ids=list(range(len(self.forbidden_phrases))),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(self.forbidden_phrases)
+            )
+            # scratch space can't be shared between threads
+            self._hs_local = threading.local()
+
+        self._re2_set = _build_re2_set(self.forbidden_phrases)
+
     def analyze(self, text):
         """
         Returns a dictionary:
@@ -35,17 +110,47 @@ class PromptDetector:
             "matches": [patterns that triggered]
         }
         """
-        matches = []
+        # Most prompts contain none of the phrases: a few substring tests on
+        # the lowercased text rule that out before any regex runs. Only for
+        # ASCII, where lower() agrees with re.IGNORECASE, and only without
+        # Hyperscan, which is already faster than the substring tests
+        if self._literals is not None and self._hs_db is None and text.isascii():
+            low = text.lower()
+            if not any(lit in low for lit in self._literals):
+                return {"is_flagged": False, "matches": []}
 
-        for p in self.patterns:
-            if p.search(text):
-                matches.append(p.pattern)
+        hits = self._scan(text)
+
+        # report in the same order as forbidden_phrases
+        matches = [self.forbidden_phrases[i] for i in sorted(hits)]
 
         return {
             "is_flagged": len(matches) > 0,
             "matches": matches
         }
 
+    def _scan(self, text: str) -> set:
+        """Indices of all patterns that occur in text"""
+        # Hyperscan's caseless matching is ASCII-only, while re.IGNORECASE also
+        # folds some non-ASCII letters, so non-ASCII text uses RE2 or re. The
+        # prompt is user input, so RE2's linear-time matching is preferred
+        if self._hs_db is None or not text.isascii():
+            if self._re2_set is not None:
+                return set(self._re2_set.Match(text.translate(_RE2_FOLD)) or ())
+            return {int(m.lastgroup[1:]) for m in self.combined.finditer(text)}
+
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None:
+            scratch = self._hs_local.scratch = hyperscan.Scratch(self._hs_db)
+
+        hits = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            hits.add(pattern_id)
+
+        self._hs_db.scan(text.encode("ascii"), match_event_handler=on_match, scratch=scratch)
+        return hits
+
 
 # -----------------------------
 # MANUAL TEST
@@ -1,6 +1,35 @@
 import re
 import unicodedata
 
+# Whole "instruction stem" lines like "Run this: /" or "Execute: )", matched
+# in place with MULTILINE; [^\S\n] is whitespace that stays on the same line
+INSTRUCTION_LINE_RE = re.compile(r"^[^\S\n]*[A-Za-z][A-Za-z ]*:(?:[/\'\"\(\)]|[^\S\n])*$", re.MULTILINE)
+
+# One pass for the generic cleanup. Matches either
+#   - a run of quote/paren/whitespace chars ending in punctuation
+#     (the fillers before/between .,!? are dropped), or
+#   - any other run of quote/paren/whitespace chars (becomes one space).
+#     A lone whitespace char other than a newline would be left as it is,
+#     so it isn't matched at all (no callback for every space between words)
+CLEANUP_RE = re.compile(r"(?:[\s'\"()]*[.,!?])+|[\s'\"()]{2,}|['\"()\n]")
+CLEANUP_FILLER_RE = re.compile(r"[\s'\"()]+")
+REPEATED_PUNCT_RE = re.compile(r"([.,!?])\1+")
+
+
+def _literal_scanner(patterns, triggers):
+    """
+    Function telling whether lowercased text contains any of the trigger
+    literals of patterns. None if a pattern has no triggers listed, since
+    then skipping on a miss wouldn't be safe.
+
+    Plain substring tests: for this handful of literals they beat a
+    pyahocorasick automaton even on multi-KB prompts.
+    """
+    if any(p not in triggers for p in patterns):
+        return None
+    literals = sorted({lit for p in patterns for lit in triggers[p]})
+    return lambda low: any(lit in low for lit in literals)
+
 
 class PromptSanitizer:
     """
@@ -30,12 +59,53 @@ class PromptSanitizer:
             r"(token\s*[:=]\s*)(\S+)": r"\1[REDACTED]",
         }
 
+        # Lowercase literals that every match of a pattern contains. ASCII
+        # text with none of them can't match, so the passes are skipped.
+        # A pattern missing here turns the shortcut off for its group.
+        self.structural_triggers = {
+            r"[\`;]": ("`", ";"),
+            r"\$\(": ("$(",),
+            r"\b(rm -rf|chmod 777)\b": ("rm -rf", "chmod 777"),
+            r"\b(eval|exec)\s*\(": ("eval", "exec"),
+            r"os\.system\s*\(": ("os.system",),
+            r"subprocess\.Popen": ("subprocess.popen",),
+            r"__import__": ("__import__",),
+        }
+        self.redact_triggers = {
+            r"(password\s*[:=]\s*)(\S+)": ("password",),
+            r"(api[_-]?key\s*[:=]\s*)(\S+)": ("api_key", "api-key", "apikey"),
+            r"(secret\s*[:=]\s*)(\S+)": ("secret",),
+            r"(token\s*[:=]\s*)(\S+)": ("token",),
+        }
+        self._structural_scanner = _literal_scanner(self.structural_patterns, self.structural_triggers)
+        self._redact_scanner = _literal_scanner(list(self.redact_patterns), self.redact_triggers)
+
+        # Compile once; the passes stay sequential on purpose, since removing
+        # one construct can expose another (e.g. "ev;al(" -> "eval(")
+        self._structural_res = [re.compile(p, re.IGNORECASE) for p in self.structural_patterns]
+        self._redact_res = [
+            (re.compile(p, re.IGNORECASE), replacement)
+            for p, replacement in self.redact_patterns.items()
+        ]
+        # All redaction patterns as one alternation, to check in a single pass
+        # whether there is anything to redact at all. The substitutions still
+        # run one by one: a value can hide another key ("token=apikey= x"),
+        # and a single leftmost pass would leave that second secret in place.
+        self._redact_any = re.compile("|".join(self.redact_patterns), re.IGNORECASE)
+
+    @staticmethod
+    def _cannot_match(scanner, text):
+        """True if text has none of the scanner's literals (ASCII only, where
+        lower() agrees with re.IGNORECASE)"""
+        return scanner is not None and text.isascii() and not scanner(text.lower())
+
     # --------------------------
     # 1. Normalize Unicode
     # --------------------------
     def normalize_text(self, text):
         """Normalize Unicode to remove obfuscated characters."""
-        return unicodedata.normalize("NFKC", text)
+        # NFKC never changes pure ASCII, so skip the copy for the common case
+        return text if text.isascii() else unicodedata.normalize("NFKC", text)
 
     # --------------------------
     # 2. Remove structural malicious content
@@ -45,8 +115,10 @@ class PromptSanitizer:
         Remove malicious structural constructs (LLM jailbreak attempts,
         shell commands, Python eval/exec, etc.), independent of prompt phrasing.
         """
-        for pattern in self.structural_patterns:
-            text = re.sub(pattern, "", text, flags=re.IGNORECASE)
+        if self._cannot_match(self._structural_scanner, text):
+            return text
+        for pattern in self._structural_res:
+            text = pattern.sub("", text)
         return text
 
     # --------------------------
@@ -54,8 +126,10 @@ class PromptSanitizer:
     # --------------------------
     def redact_sensitive_info(self, text):
         """Redact secrets regardless of prompt phrasing."""
-        for pattern, replacement in self.redact_patterns.items():
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+        if self._cannot_match(self._redact_scanner, text) or not self._redact_any.search(text):
+            return text
+        for pattern, replacement in self._redact_res:
+            text = pattern.sub(replacement, text)
         return text
 
     # --------------------------
@@ -69,37 +143,28 @@ class PromptSanitizer:
         - Normalize whitespace and punctuation
         """
 
-        # Split into lines for safer processing
-        lines = text.split("\n")
-        cleaned_lines = []
+        # Remove entire instruction lines like: "Run this: /", "Execute: )",
+        # "Also execute: ''" without splitting the text into lines; the
+        # newlines left behind are collapsed with the other whitespace below
+        text = INSTRUCTION_LINE_RE.sub("", text)
 
-        for line in lines:
-            stripped = line.strip()
-
-            # Remove entire instruction lines like:
-            # "Run this: /", "Execute: )", "Also execute: ''"
-            if re.match(r"^[A-Za-z ]+:\s*[/\'\"\(\)\s]*$", stripped):
-                continue
-
-            cleaned_lines.append(stripped)
-
-        # Join cleaned lines
-        text = " ".join(cleaned_lines)
-
-        # Remove leftover punctuation fragments
-        text = re.sub(r"['\"\(\)]+", " ", text)
-
-        # Collapse multiple spaces
-        text = re.sub(r"\s{2,}", " ", text)
-
-        # Fix spacing before punctuation
-        text = re.sub(r"\s+([.,!?])", r"\1", text)
-
-        # Collapse repeated punctuation
-        text = re.sub(r"([.,!?])\1+", r"\1", text)
+        # In one pass: remove leftover punctuation fragments, collapse
+        # multiple spaces, fix spacing before punctuation and collapse
+        # repeated punctuation
+        text = CLEANUP_RE.sub(self._cleanup_match, text)
 
         return text.strip()
 
+    @staticmethod
+    def _cleanup_match(match):
+        run = match.group()
+        if run[-1] in ".,!?":
+            # punctuation run: drop the fillers, then collapse repeats
+            return REPEATED_PUNCT_RE.sub(r"\1", CLEANUP_FILLER_RE.sub("", run))
+        # anything else becomes a single space (lone newlines too, since the
+        # lines are joined with spaces)
+        return " "
+
     # --------------------------
     # 5. Defensive header
     # --------------------------
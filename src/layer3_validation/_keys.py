@@ -0,0 +1,55 @@
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Most recent results kept by each Layer 3 cache
+CACHE_SIZE = 4096
+
+
+def content_key(*parts: str) -> bytes:
+    """
+    Short hash of one or more strings, used as the key of every Layer 3 cache.
+    BLAKE2b with a 16-byte digest: fast, and collisions aren't a concern here.
+    """
+    # Same digest as hashing "\x00".join(parts), without building the joined copy
+    h = hashlib.blake2b(digest_size=16)
+    for i, part in enumerate(parts):
+        if i:
+            h.update(b"\x00")
+        h.update(part.encode("utf-8"))
+    return h.digest()
+
+
+class LRUCache:
+    """
+    Thread-safe key -> result cache that drops the least recently used
+    entry once it holds more than maxsize results. Results are copied on the
+    way in and out, so a caller changing its result dict can't change what
+    later cache hits get.
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Copy of the cached value for key, or None"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                return None
+            self._data.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
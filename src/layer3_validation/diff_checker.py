@@ -9,15 +9,35 @@ class DiffChecker:
         self.max_added_lines = 20  # adjustable
 
     def compare(self, original, patched):
-        diff = list(difflib.unified_diff(
-            original.splitlines(),
-            patched.splitlines(),
-            lineterm=""
-        ))
+        added = []
+        removed = []
 
-        added = [l for l in diff if l.startswith("+") and not l.startswith("+++")]
-        removed = [l for l in diff if l.startswith("-") and not l.startswith("---")]
+        # Unchanged patch (or only line endings changed): nothing to diff
+        if original == patched:
+            return self._result(added, removed)
+        original_lines = original.splitlines()
+        patched_lines = patched.splitlines()
+        if original_lines == patched_lines:
+            return self._result(added, removed)
 
+        # One pass over the diff; n=0 leaves out the context lines, which
+        # aren't counted anyway (the +/- lines are the same for any n)
+        for line in difflib.unified_diff(
+            original_lines,
+            patched_lines,
+            lineterm="",
+            n=0
+        ):
+            if line.startswith("+"):
+                if not line.startswith("+++"):
+                    added.append(line)
+            elif line.startswith("-"):
+                if not line.startswith("---"):
+                    removed.append(line)
+
+        return self._result(added, removed)
+
+    def _result(self, added, removed):
         too_many_changes = len(added) > self.max_added_lines
 
         return {
@@ -1,6 +1,69 @@
 import subprocess
 import json
+import os
+import shutil
 import tempfile
+import time
+import urllib.request
+from functools import lru_cache
+from pathlib import Path
+
+from ._keys import LRUCache, content_key
+
+# Downloaded registry rulesets are reused for this long before re-fetching.
+# Kept in a private per-user directory: a ruleset planted in a shared one
+# (e.g. an empty file under /tmp) would switch the Semgrep check off
+RULES_CACHE_DIR = Path.home() / ".cache" / "patchguard" / "semgrep"
+RULES_MAX_AGE = 24 * 60 * 60
+# After a failed download, wait this long before trying again
+RULES_RETRY_DELAY = 10 * 60
+
+# ruleset -> time of the last failed download
+_failed_downloads = {}
+
+# Don't let every semgrep run ask the network for a newer version
+SEMGREP_ENV = dict(os.environ, SEMGREP_ENABLE_VERSION_CHECK="0")
+
+
+@lru_cache(maxsize=1)
+def semgrep_path():
+    """Path of the semgrep binary, looked up once per process (None if missing)"""
+    return shutil.which("semgrep")
+
+
+def resolve_config(config: str) -> str:
+    """
+    Turn a registry ruleset like "p/python" into a local YAML file, so semgrep
+    doesn't download (and re-parse the registry response) on every scan.
+    The file's age is checked on every call, so long runs pick up the
+    refreshed ruleset. Falls back to the registry name if it can't be downloaded.
+    """
+    if not config.startswith(("p/", "r/")):
+        return config
+
+    rules_file = RULES_CACHE_DIR / (config.replace("/", "-") + ".yaml")
+    try:
+        if not rules_file.exists() or time.time() - rules_file.stat().st_mtime > RULES_MAX_AGE:
+            if time.time() - _failed_downloads.get(config, 0) < RULES_RETRY_DELAY:
+                return str(rules_file) if rules_file.exists() else config
+            RULES_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with urllib.request.urlopen(f"https://semgrep.dev/c/{config}", timeout=30) as response:
+                rules = response.read()
+            # unique temp file per download, so processes fetching at the
+            # same time don't overwrite each other's partial file
+            with tempfile.NamedTemporaryFile(dir=RULES_CACHE_DIR, suffix=".tmp", delete=False) as tmp:
+                tmp.write(rules)
+            try:
+                os.replace(tmp.name, rules_file)
+            except OSError:
+                os.unlink(tmp.name)
+                raise
+        return str(rules_file)
+    except Exception:
+        _failed_downloads[config] = time.time()
+        # a stale ruleset is still better than none
+        return str(rules_file) if rules_file.exists() else config
+
 
 class SemgrepRunner:
     """
@@ -8,17 +71,38 @@ class SemgrepRunner:
     Runs Semgrep security rules on the generated patch.
     """
 
+    def __init__(self, config: str = "p/python"):
+        self.config = config
+        # code hash -> result, so an identical patch is only scanned once
+        self._cache = LRUCache()
+
     def run(self, code: str):
-        # Write patched code to a temporary file for Semgrep to scan
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as tmp:
-            tmp.write(code.encode())
-            tmp_path = tmp.name
+        key = content_key(code)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._run(code)
+            if "error" not in result:
+                self._cache.put(key, result)
+        return result
+
+    def _run(self, code: str):
+        semgrep = semgrep_path()
+        if semgrep is None:
+            return {
+                "safe": False,
+                "error": "semgrep not found. Install with: pip install semgrep"
+            }
 
         try:
-            # Run Semgrep with Python security ruleset
+            # Run Semgrep with Python security ruleset; the patch is passed
+            # on stdin ("-" target), so there is no temp file to create,
+            # rewrite or unlink per call on our side. That target has no .py
+            # extension, so language detection by extension is switched off
+            # and the rules' own language (python) is used
             result = subprocess.run(
-                ["semgrep", "--config", "p/python", "--json", tmp_path],
-                capture_output=True, text=True
+                [semgrep, "--config", resolve_config(self.config), "--json",
+                 "--scan-unknown-extensions", "-"],
+                input=code, capture_output=True, text=True, env=SEMGREP_ENV
             )
 
             output = json.loads(result.stdout or "{}")
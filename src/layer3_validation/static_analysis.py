@@ -1,4 +1,12 @@
+import ast
 import re
+import threading
+
+# Optional: Hyperscan compiles all patterns into one SIMD DFA (pip install hyperscan)
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 class StaticAnalyzer:
     """
@@ -27,19 +35,98 @@ class StaticAnalyzer:
             r"rm -rf": "CWE-77 (Command Injection / Improper Command Sanitization)",
         }
 
-    def analyze(self, code: str):
-        issues = []
+        # Call names that the AST check maps onto the patterns above, so calls
+        # the regexes miss (e.g. "os .system (" split across lines) still count
+        self.forbidden_calls = {
+            "os.system": r"os\.system\s*\(",
+            "subprocess.Popen": r"subprocess\.Popen",
+            "eval": r"eval\s*\(",
+            "exec": r"exec\s*\(",
+            "__import__": r"__import__",
+        }
 
-        for pattern in self.forbidden:
-            if re.search(pattern, code, flags=re.IGNORECASE):
+        # One alternation over all patterns (named groups p<i>), so the code
+        # is scanned once; zero-width lookahead keeps overlapping hits
+        self.combined = re.compile(
+            "(?=" + "|".join(f"(?P<p{i}>{p})" for i, p in enumerate(self.forbidden)) + ")",
+            re.IGNORECASE
+        )
 
-                issues.append({
-                    "pattern": pattern,
-                    "cwe": self.cwe_map.get(pattern, "Unknown CWE"),
-                    "description": f"Dangerous pattern detected: {pattern}"
-                })
+        # Same patterns as a Hyperscan database, if available
+        self._hs_db = None
+        if hyperscan is not None:
+            self._hs_db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+            self._hs_db.compile(
+                expressions=[p.encode() for p in self.forbidden],
+                ids=list(range(len(self.forbidden))),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(self.forbidden)
+            )
+            # scratch space can't be shared between threads
+            self._hs_local = threading.local()
+
+    def analyze(self, code: str, tree: ast.AST = None):
+        """
+        Scan code for forbidden patterns. If the parsed tree is passed in,
+        forbidden calls found structurally are reported as well.
+        """
+        issues = []
+        hits = self._scan(code)
+        if tree is not None:
+            hits |= self.analyze_ast(tree)
+
+        # report in the same order as self.forbidden
+        for i in sorted(hits):
+            pattern = self.forbidden[i]
+            issues.append({
+                "pattern": pattern,
+                "cwe": self.cwe_map.get(pattern, "Unknown CWE"),
+                "description": f"Dangerous pattern detected: {pattern}"
+            })
 
         return {
             "safe": len(issues) == 0,
             "issues": issues
         }
+
+    def analyze_ast(self, tree: ast.AST) -> set:
+        """Indices of the patterns whose calls appear in the syntax tree"""
+        hits = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                pattern = self.forbidden_calls.get(_dotted_name(node.func))
+                if pattern is not None:
+                    hits.add(self.forbidden.index(pattern))
+            elif isinstance(node, ast.Name) and node.id == "__import__":
+                hits.add(self.forbidden.index(self.forbidden_calls["__import__"]))
+        return hits
+
+    def _scan(self, text: str) -> set:
+        """Indices of all patterns that occur in text"""
+        # Hyperscan's caseless matching is ASCII-only, while re.IGNORECASE also
+        # folds some non-ASCII letters, so non-ASCII text always uses re
+        if self._hs_db is None or not text.isascii():
+            return {int(m.lastgroup[1:]) for m in self.combined.finditer(text)}
+
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None:
+            scratch = self._hs_local.scratch = hyperscan.Scratch(self._hs_db)
+
+        hits = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            hits.add(pattern_id)
+
+        self._hs_db.scan(text.encode("ascii"), match_event_handler=on_match, scratch=scratch)
+        return hits
+
+
+def _dotted_name(node: ast.AST) -> str:
+    """"os.system" for an os.system reference, "" for anything that isn't a plain name"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return ""
+    parts.append(node.id)
+    return ".".join(reversed(parts))
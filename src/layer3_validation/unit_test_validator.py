@@ -1,14 +1,30 @@
 import subprocess
 import tempfile
+import sys
 import os
 
+from ._keys import LRUCache, content_key
+
 class UnitTestValidator:
     """
     Layer 3D: Execute unit tests on the patched code
     to ensure functional correctness.
     """
 
+    def __init__(self):
+        # (code, tests) hash -> result, so an identical patch is only tested once
+        self._cache = LRUCache()
+
     def run_tests(self, code: str, test_code: str):
+        key = content_key(code, test_code)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._run_tests(code, test_code)
+            if "error" not in result:
+                self._cache.put(key, result)
+        return result
+
+    def _run_tests(self, code: str, test_code: str):
         # Create a temporary directory for executing tests
         with tempfile.TemporaryDirectory() as tmpdir:
             code_file = os.path.join(tmpdir, "patched.py")
@@ -22,10 +38,13 @@ class UnitTestValidator:
             with open(test_file, "w") as f:
                 f.write(test_code)
 
-            # Use pytest quietly (-q)
+            # Use pytest quietly (-q). It stays a separate process on purpose:
+            # the patch is untrusted, and in-process runs would reuse the
+            # cached 'patched' module and aren't thread-safe. No cache dir
+            # is written since the tmpdir is thrown away anyway.
             try:
                 result = subprocess.run(
-                    ["pytest", "-q", tmpdir],
+                    [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", tmpdir],
                     capture_output=True, text=True
                 )
                 passed = (result.returncode == 0)
@@ -1,11 +1,29 @@
 import ast
 import difflib
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
 
 from .static_analysis import StaticAnalyzer
 from .diff_checker import DiffChecker
-from .semgrep_runner import SemgrepRunner
-from .unit_test_validator import UnitTestValidator
+from ._keys import LRUCache, content_key
+
+
+def skipped():
+    """Placeholder result for a check that wasn't run"""
+    return {"skipped": True}
+
+
+@lru_cache(maxsize=256)
+def parse_code(code: str):
+    """
+    Parse code once and share the tree between the checks.
+    Returns None if it isn't valid Python (or is too deeply nested to parse).
+    """
+    try:
+        return ast.parse(code, mode="exec")
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
 
 
 class PatchValidator:
@@ -19,8 +37,36 @@ class PatchValidator:
     def __init__(self):
         self.static_analyzer = StaticAnalyzer()
         self.diff_checker = DiffChecker()
-        self.semgrep = SemgrepRunner()
-        self.unit_tester = UnitTestValidator()
+
+        # (original, patch) hash -> validation result. The validator is shared
+        # between pipelines and threads, so the cache is thread-safe
+        self._cache = LRUCache()
+
+    # Semgrep and pytest are only needed for patches that pass the cheap
+    # checks, so their modules are imported (and the runners built) on first use
+    @cached_property
+    def semgrep(self):
+        from .semgrep_runner import SemgrepRunner
+        return SemgrepRunner()
+
+    @cached_property
+    def unit_tester(self):
+        from .unit_test_validator import UnitTestValidator
+        return UnitTestValidator()
+
+    def warmup(self):
+        """
+        Do the cheap one-off Semgrep/pytest setup (imports, building the
+        runners, finding the semgrep binary) ahead of time, e.g. while the LLM
+        is still generating the patch. Nothing is validated here. The ruleset
+        download is left to the first Semgrep scan, so it only happens once a
+        patch actually gets past the cheap checks.
+        """
+        from .semgrep_runner import semgrep_path
+
+        # build the lazy runners now rather than on first use
+        _ = self.semgrep, self.unit_tester
+        semgrep_path()
 
     # -----------------------------------------------------------
     #  AST SYNTAX CHECKER
@@ -30,27 +76,59 @@ class PatchValidator:
         Returns True if the patch code is syntactically valid Python.
         Uses the built-in AST parser.
         """
-        try:
-            ast.parse(code)
-            return True
-        except SyntaxError:
-            return False
+        return parse_code(code) is not None
 
     # -----------------------------------------------------------
     #  MASTER VALIDATION PIPELINE
     # -----------------------------------------------------------
     def validate(self, original_code: str, generated_patch: str) -> dict:
         """
-        Runs all three validators:
-        1. static analysis
-        2. diff validation
-        3. syntax validation
+        Runs the validators cheapest first and stops at the first failure:
+        1. syntax validation
+        2. static analysis
+        3. diff validation
+        4. semgrep + unit tests (in parallel)
+        Checks that weren't run are reported as {"skipped": True}.
+        Results are cached, so the same patch is only validated once.
         """
+        key = content_key(original_code, generated_patch)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self._validate(original_code, generated_patch)
+
+        # Only keep results that needed semgrep/pytest; patches rejected by the
+        # cheap checks are re-validated in microseconds. Results where semgrep
+        # or pytest failed to run at all are never kept
+        semgrep, unit_tests = result["semgrep"], result["unit_tests"]
+        if "skipped" not in semgrep and "error" not in semgrep and "error" not in unit_tests:
+            self._cache.put(key, result)
+        return result
+
+    def _validate(self, original_code: str, generated_patch: str) -> dict:
+        result = {
+            "valid": False,
+            "static_analysis": skipped(),
+            "diff_analysis": skipped(),
+            "syntax_valid": False,
+            "semgrep": skipped(),
+            "unit_tests": skipped()
+        }
+
+        # Cheap checks (microseconds) - any failure already rejects the patch
+        tree = parse_code(generated_patch)
+        result["syntax_valid"] = tree is not None
+        if tree is None:
+            return result
+
+        result["static_analysis"] = self.static_analyzer.analyze(generated_patch, tree)
+        if not result["static_analysis"]["safe"]:
+            return result
 
-        static_result = self.static_analyzer.analyze(generated_patch)
-        diff_result = self.diff_checker.compare(original_code, generated_patch)
-        syntax_valid = self.syntax_is_valid(generated_patch)
-        semgrep_result = self.semgrep.run(generated_patch)
+        result["diff_analysis"] = self.diff_checker.compare(original_code, generated_patch)
+        if not result["diff_analysis"]["valid"]:
+            return result
 
         # optional: keep empty tests if no tests provided
         test_code = (
@@ -59,25 +137,17 @@ class PatchValidator:
             "    assert patched.add(1, 2) == 3\n"
         )
 
-
-        unit_test_result = self.unit_tester.run_tests(generated_patch, test_code)
-
-        overall_valid = (
-            static_result["safe"]
-            and diff_result["valid"]
-            and syntax_valid
-            and semgrep_result["safe"]
-            and unit_test_result["passed"]
-        )
-
-        return {
-            "valid": overall_valid,
-            "static_analysis": static_result,
-            "diff_analysis": diff_result,
-            "syntax_valid": syntax_valid,
-            "semgrep": semgrep_result,
-            "unit_tests": unit_test_result
-        }
+        # Expensive checks are subprocesses, so run them side by side: Semgrep
+        # on a helper thread owned by this call, pytest on the caller's thread.
+        # No shared pool, so concurrent validations never queue behind each other
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="patchguard-semgrep") as executor:
+            semgrep_future = executor.submit(self.semgrep.run, generated_patch)
+            unit_tests = self.unit_tester.run_tests(generated_patch, test_code)
+            result["semgrep"] = semgrep_future.result()
+        result["unit_tests"] = unit_tests
+
+        result["valid"] = result["semgrep"]["safe"] and result["unit_tests"]["passed"]
+        return result
 
 
 # -----------------------------------------------------------
@@ -0,0 +1,148 @@
+"""
+vLLM Patcher
+============
+Same (vulnerable) direct-prompting patcher as SimplePromptPatcher, but talks
+to a vLLM server through its OpenAI-compatible API instead of Ollama.
+
+vLLM batches concurrent requests into shared forward passes (continuous
+batching), so generate_patch_batch sends all samples at once instead of
+packing them into a single prompt.
+
+Prompts are byte-identical to SimplePromptPatcher's. They share only the
+short PATCH_PROMPT_PREFIX, so prefix caching (below) helps little here.
+
+Start a server first, e.g.:
+    vllm serve meta-llama/Llama-3.1-8B-Instruct --max-num-batched-tokens 8192 --enable-prefix-caching
+"""
+
+import asyncio
+import os
+from typing import Dict, List
+
+try:
+    from openai import AsyncOpenAI, OpenAI
+except ImportError:
+    AsyncOpenAI = OpenAI = None
+
+try:
+    from src.baseline_patcher import SimplePromptPatcher
+except ImportError:
+    # Fallback if run from src directory
+    from baseline_patcher import SimplePromptPatcher
+
+
+class VLLMPatcher(SimplePromptPatcher):
+    """
+    Direct prompting against a vLLM OpenAI-compatible server.
+    VULNERABLE like SimplePromptPatcher: no sanitization at all.
+    """
+
+    def __init__(
+        self,
+        model: str = "meta-llama/Llama-3.1-8B-Instruct",
+        base_url: str = None,
+        api_key: str = "EMPTY",
+        max_tokens: int = 1024
+    ):
+        """
+        Args:
+            model: Model name the vLLM server was started with
+            base_url: Server URL (default: $VLLM_BASE_URL or http://localhost:8000/v1)
+            api_key: vLLM doesn't check it unless started with --api-key
+            max_tokens: Max tokens generated per patch
+        """
+        if OpenAI is None:
+            raise RuntimeError("openai package not found. Install with: pip install openai")
+
+        # the vLLM server loads its model at startup, nothing to preload
+        super().__init__(model, preload=False)
+        self.base_url = base_url or os.environ.get("VLLM_BASE_URL", "http://localhost:8000/v1")
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+        self.client = OpenAI(base_url=self.base_url, api_key=self.api_key)
+
+    def warmup(self) -> bool:
+        """Nothing to load: the vLLM server has its model loaded from startup"""
+        return True
+
+    def generate_patch(
+        self,
+        buggy_code: str,
+        issue_description: str,
+        file_extension: str = ".py"
+    ) -> Dict[str, any]:
+        """Generate one patch with a blocking request"""
+        prompt = self._build_prompt(buggy_code, issue_description, file_extension)
+
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=self.max_tokens
+            )
+            return self._to_result(response.choices[0].message.content)
+
+        except Exception as e:
+            return self._error_result(buggy_code, e)
+
+    def async_client(self):
+        """New AsyncOpenAI client for agenerate_patch"""
+        return AsyncOpenAI(base_url=self.base_url, api_key=self.api_key)
+
+    async def agenerate_patch(
+        self,
+        client,
+        buggy_code: str,
+        issue_description: str,
+        file_extension: str = ".py"
+    ) -> Dict[str, any]:
+        """Generate one patch using an AsyncOpenAI client"""
+        prompt = self._build_prompt(buggy_code, issue_description, file_extension)
+
+        try:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=self.max_tokens
+            )
+            return self._to_result(response.choices[0].message.content)
+
+        except Exception as e:
+            return self._error_result(buggy_code, e)
+
+    def generate_patch_batch(
+        self,
+        buggy_codes: List[str],
+        issue_descriptions: List[str],
+        file_extension: str = ".py"
+    ) -> List[Dict[str, any]]:
+        """
+        Generate patches for several samples by sending all requests
+        concurrently, so the vLLM scheduler can batch them together.
+        """
+        async def run_all():
+            # one async client per batch, since it is tied to the running event loop
+            async with self.async_client() as client:
+                return await asyncio.gather(*[
+                    self.agenerate_patch(client, code, issue, file_extension)
+                    for code, issue in zip(buggy_codes, issue_descriptions)
+                ])
+
+        return list(asyncio.run(run_all()))
+
+    def _to_result(self, output: str) -> Dict[str, any]:
+        output = output or ""
+        return {
+            "patched_code": self._extract_code(output.strip()),
+            "success": True,
+            "error": None,
+            "stdout": output
+        }
+
+    def _error_result(self, buggy_code: str, error: Exception) -> Dict[str, any]:
+        return {
+            "patched_code": buggy_code,
+            "success": False,
+            "error": str(error),
+            "stdout": ""
+        }